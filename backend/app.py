@@ -5,6 +5,7 @@ except ImportError:
     ta = None
 
 import os
+import importlib.util
 import pandas as pd
 import joblib
 from flask import Flask, jsonify
@@ -22,6 +23,17 @@ MODEL_PATH = os.path.join(BASE_DIR, "..", "model", "crypto_model_enhanced.pkl")
 SCALER_PATH = os.path.join(BASE_DIR, "..", "model", "scaler_enhanced.pkl")
 DATA_PATH = os.path.join(BASE_DIR, "..", "data", "features_enhanced.csv")
 
+ATTRIBUTION_PATH = os.path.join(BASE_DIR, "..", "model", "attribution.py")
+
+# load model/attribution.py by path so the rest of model/ stays off sys.path
+try:
+    _spec = importlib.util.spec_from_file_location("attribution", ATTRIBUTION_PATH)
+    attribution = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(attribution)
+except (ImportError, OSError) as e:
+    attribution = None
+    print("⚠️ attribution.py not loaded; explanations disabled:", e)
+
 # ---------------------------------------------------------
 # Load model and scaler
 # ---------------------------------------------------------
@@ -66,6 +78,28 @@ if not features_list:
         "rsi14", "macd", "macd_signal", "macd_diff", "atr14", "roc5", "roc10"
     ]
 
+# ---------------------------------------------------------
+# Per-prediction explainer (cached per model version + date)
+# ---------------------------------------------------------
+explainer = None
+if model is not None and attribution is not None:
+    try:
+        explainer = attribution.Explainer(model, features_list, attribution.model_version(MODEL_PATH))
+        print("✅ Explainer ready for model version:", explainer.version)
+    except TypeError as e:
+        print("⚠️ Explanations disabled:", e)
+
+
+def safe_explain(x, **kwargs):
+    """Explanation for one scaled row, or None; never fails the prediction it rides on."""
+    if explainer is None:
+        return None
+    try:
+        return explainer.explain(x, **kwargs)
+    except Exception as e:
+        print("⚠️ Explanation failed:", e)
+        return None
+
 # ---------------------------------------------------------
 # Routes
 # ---------------------------------------------------------
@@ -102,11 +136,13 @@ def predict_latest():
             return jsonify({"error": "Model not loaded properly."}), 500
 
         y_pred = model.predict(X_scaled)[0]
+        date_used = latest["date"].values[0] if "date" in latest else None
 
         return jsonify({
             "predicted_next_close": round(float(y_pred), 2),
-            "date_used": latest["date"].values[0] if "date" in latest else None,
-            "features_used": features_list
+            "date_used": date_used,
+            "features_used": features_list,
+            "explanation": safe_explain(X_scaled[0], key=date_used)
         })
 
     except Exception as e:
@@ -221,7 +257,10 @@ def predict_horizon():
             # recompute rolling features on temp (for next iteration)
             temp = compute_rolling_features(temp)
 
-            preds.append({"date": next_date.strftime("%Y-%m-%d"), "predicted_close": round(pred, 2)})
+            step = {"date": next_date.strftime("%Y-%m-%d"), "predicted_close": round(pred, 2)}
+            # forecast rows are synthetic, so these are not cached by date
+            step["explanation"] = safe_explain(X_scaled[0], top=5)
+            preds.append(step)
 
             # update last_date
             last_date = next_date
@@ -233,6 +272,58 @@ def predict_horizon():
         return jsonify({"error": str(e), "traceback": traceback.format_exc()}), 500
 
 
+# ---------------------------------------------------------
+# Explain a prediction
+# ---------------------------------------------------------
+@app.route("/explain", methods=["GET"])
+def explain():
+    """
+    Per-feature contributions to the model's prediction from one dataset row.
+    Query params: ?date=YYYY-MM-DD (default: latest valid row), ?top=5
+    Returns JSON: { "date": ..., "predicted_next_close": ..., "method": ..., "base_value": ...,
+                    "contributions": [ {"feature": ..., "contribution": ...}, ... ] }
+    "method" is "treeshap" for XGBoost / LightGBM and "saabas" for sklearn forests
+    (a path-based approximation that over-credits features split near the root).
+    """
+    try:
+        import flask
+        if explainer is None:
+            return jsonify({"error": "Explanations are not available for this model."}), 501
+
+        top = flask.request.args.get("top")
+        try:
+            top = int(top) if top else None
+        except ValueError:
+            return jsonify({"error": "top must be a positive integer"}), 400
+        if top is not None and top <= 0:
+            return jsonify({"error": "top must be a positive integer"}), 400
+
+        valid = df.dropna()
+        date = flask.request.args.get("date")
+        if date:
+            try:
+                wanted = pd.to_datetime(date).normalize()
+            except (ValueError, TypeError):
+                return jsonify({"error": f"Invalid date {date!r}; use YYYY-MM-DD."}), 400
+            row = valid[pd.to_datetime(valid["date"]).dt.normalize() == wanted]
+        else:
+            row = valid.tail(1)
+        if row.empty:
+            return jsonify({"error": f"No valid row found for date {date}."}), 404
+
+        X_scaled = scaler.transform(row[features_list])
+        date_used = row["date"].values[0]
+
+        return jsonify({
+            "date": date_used,
+            "predicted_next_close": round(float(model.predict(X_scaled)[0]), 2),
+            **explainer.explain(X_scaled[0], key=date_used, top=top)
+        })
+
+    except Exception as e:
+        import traceback
+        return jsonify({"error": str(e), "traceback": traceback.format_exc()}), 500
+
 
 # ---------------------------------------------------------
 # Run app
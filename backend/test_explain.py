@@ -0,0 +1,50 @@
+# backend/test_explain.py
+# Checks the explanation fields served by app.py through Flask's test client
+# (no running server needed): python backend/test_explain.py
+import os, importlib.util
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+spec = importlib.util.spec_from_file_location("app", os.path.join(BASE_DIR, "app.py"))
+app_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(app_module)
+client = app_module.app.test_client()
+
+assert app_module.explainer is not None, "explainer did not load"
+
+# /predict_latest carries an explanation that adds up to the prediction
+r = client.get("/predict_latest")
+assert r.status_code == 200, r.get_json()
+body = r.get_json()
+exp = body["explanation"]
+assert exp["method"] in ("treeshap", "saabas"), exp
+total = exp["base_value"] + sum(c["contribution"] for c in exp["contributions"])
+assert abs(total - body["predicted_next_close"]) < 0.01 * (len(exp["contributions"]) + 2), (total, body)
+print("/predict_latest:", body["predicted_next_close"], "explained by", exp["method"])
+
+# /predict_horizon: every step has a top-5 explanation
+r = client.get("/predict_horizon?n=3")
+assert r.status_code == 200, r.get_json()
+steps = r.get_json()["predictions"]
+assert len(steps) == 3 and all(len(s["explanation"]["contributions"]) == 5 for s in steps), steps
+print("/predict_horizon: 3 steps explained")
+
+# /explain: default row, non-padded date, and bad input
+latest = client.get("/explain?top=3").get_json()
+assert len(latest["contributions"]) == 3 and latest["date"] == body["date_used"], latest
+
+first_date = app_module.df.dropna()["date"].iloc[0]          # e.g. 2017-07-19
+y, m, d = first_date.split("-")
+r = client.get(f"/explain?date={int(y)}-{int(m)}-{int(d)}")
+assert r.status_code == 200 and r.get_json()["date"] == first_date, r.get_json()
+
+for query, status in [("top=abc", 400), ("top=0", 400), ("date=not-a-date", 400), ("date=1999-01-01", 404)]:
+    r = client.get(f"/explain?{query}")
+    assert r.status_code == status, (query, r.status_code, r.get_json())
+    assert "traceback" not in r.get_json(), query
+
+# no explainer -> 501, not a server fault
+saved, app_module.explainer = app_module.explainer, None
+assert client.get("/explain").status_code == 501
+assert client.get("/predict_latest").get_json()["explanation"] is None
+app_module.explainer = saved
+print("/explain: all checks passed")
@@ -0,0 +1,317 @@
+# model/attribution.py
+"""
+Feature attribution for bundles saved by train_model.py / train_and_compare.py
+({'model', 'scaler', 'features'} dicts).
+
+- permutation_importance(): time-series-aware permutation importance on the
+  chronological holdout. A copy of the model is refit on the rows before the
+  holdout first (train_and_compare.py fits best_model.pkl on every row, so
+  its own fit has already seen the holdout). Rows are shuffled in contiguous
+  blocks (so short-range autocorrelation survives the shuffle) and every
+  (feature, repeat) pair runs as its own task in a process pool.
+- Explainer: per-prediction contributions read straight off the trees.
+  XGBoost / LightGBM use their native TreeSHAP (pred_contribs); sklearn
+  forests use the path-based Saabas decomposition (what shap calls
+  approximate=True), which costs O(depth) per tree but tends to over-credit
+  features split near the root. Each explanation carries a "method" field
+  ("treeshap" or "saabas") so clients can tell them apart. Results are cached
+  per (model version, date).
+
+Usage:
+    python model/attribution.py --bundle model/crypto_model_enhanced.pkl --repeats 10 --jobs 4
+"""
+import os
+import sys
+import hashlib
+import argparse
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA = os.path.join(BASE_DIR, "..", "data", "features_enhanced.csv")
+DEFAULT_BUNDLE = os.path.join(BASE_DIR, "crypto_model_enhanced.pkl")
+
+
+# ---------------------------------------------------------
+# Bundle helpers
+# ---------------------------------------------------------
+def load_bundle(path):
+    """Load a saved bundle; bare estimators are wrapped into the dict format."""
+    saved = joblib.load(path)
+    if not isinstance(saved, dict):
+        saved = {"model": saved, "scaler": None, "features": []}
+    return saved
+
+
+def model_version(path):
+    """Short content hash of the bundle file, used as the cache version key."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def load_split(features, data_path=DATA, holdout=0.2):
+    """
+    Chronological split into (X_train, y_train, X_test, y_test), the test part
+    being the last `holdout` fraction of rows, with the same next-day-close
+    target the training scripts use.
+    """
+    df = pd.read_csv(data_path, parse_dates=['date']).sort_values('date').reset_index(drop=True)
+    df['target'] = df['close'].shift(-1)
+    df = df.dropna().reset_index(drop=True)
+    split = int(len(df) * (1 - holdout))
+    X, y = df[features].values, df['target'].values
+    return X[:split], y[:split], X[split:], y[split:]
+
+
+def _rmse(y_true, y_pred):
+    return float(np.sqrt(np.mean((y_true - y_pred) ** 2)))
+
+
+def _predict(bundle, X):
+    scaler = bundle.get("scaler")
+    Xs = scaler.transform(X) if scaler is not None else X
+    return bundle["model"].predict(Xs)
+
+
+# ---------------------------------------------------------
+# Permutation importance (process pool)
+# ---------------------------------------------------------
+def block_permutation(n, block_size, rng):
+    """Row order that shuffles contiguous blocks of `block_size` rows."""
+    idx = np.arange(n)
+    blocks = [idx[i:i + block_size] for i in range(0, n, block_size)]
+    order = rng.permutation(len(blocks))
+    return np.concatenate([blocks[k] for k in order])
+
+
+_WORKER = {}
+
+
+def _init_worker(bundle, X, y):
+    # one process per core already; keep estimators single-threaded
+    try:
+        bundle["model"].set_params(n_jobs=1)
+    except (AttributeError, ValueError):
+        pass
+    _WORKER.update(bundle=bundle, X=X, y=y)
+
+
+def _refit_on_train(bundle, X_train, y_train):
+    """Copy of the bundle whose model is refit on the pre-holdout rows only."""
+    from sklearn.base import clone
+    scaler = bundle.get("scaler")
+    model = clone(bundle["model"])
+    model.fit(scaler.transform(X_train) if scaler is not None else X_train, y_train)
+    return dict(bundle, model=model)
+
+
+def _permuted_rmse(task):
+    j, block_size, seed = task
+    bundle, X, y = _WORKER["bundle"], _WORKER["X"], _WORKER["y"]
+    rng = np.random.default_rng(seed)
+    Xp = X.copy()
+    Xp[:, j] = X[block_permutation(len(X), block_size, rng), j]
+    return j, _rmse(y, _predict(bundle, Xp))
+
+
+def permutation_importance(bundle_path, data_path=DATA, holdout=0.2,
+                           n_repeats=10, block_size=7, n_jobs=None, seed=42):
+    """
+    Increase in holdout RMSE when each feature is block-permuted, scored with
+    a copy of the bundle's model refit on the rows before the holdout.
+    n_jobs=None or <= 0 uses every core.
+    Returns a DataFrame sorted by importance_mean (descending).
+    """
+    if not 0 < holdout < 1:
+        raise ValueError(f"holdout must be between 0 and 1 (exclusive), got {holdout}")
+    bundle = load_bundle(bundle_path)
+    features = bundle["features"]
+    if not features:
+        raise ValueError(f"{bundle_path} has no 'features' list; save it as a "
+                         "{'model', 'scaler', 'features'} bundle like train_model.py does")
+    X_train, y_train, X, y = load_split(features, data_path, holdout)
+    if len(X) == 0 or len(X_train) == 0:
+        raise ValueError(f"holdout={holdout} leaves {len(X_train)} training and {len(X)} "
+                         f"holdout rows in {data_path}; both must be non-empty")
+    bundle = _refit_on_train(bundle, X_train, y_train)
+    baseline = _rmse(y, _predict(bundle, X))
+
+    seeds = np.random.SeedSequence(seed).spawn(len(features) * n_repeats)
+    tasks = [(j, block_size, seeds[j * n_repeats + r])
+             for j in range(len(features)) for r in range(n_repeats)]
+
+    if n_jobs is None or n_jobs <= 0:
+        n_jobs = os.cpu_count() or 1
+    if n_jobs == 1:
+        _init_worker(bundle, X, y)
+        results = list(map(_permuted_rmse, tasks))
+    else:
+        # the refit above may have started OpenMP threads (XGBoost / LightGBM),
+        # and libgomp is not fork-safe, so never fork this process
+        with ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(bundle, X, y)) as pool:
+            results = list(pool.map(_permuted_rmse, tasks, chunksize=max(1, len(tasks) // (4 * n_jobs))))
+
+    scores = np.zeros((len(features), n_repeats))
+    filled = [0] * len(features)
+    for j, rmse in results:
+        scores[j, filled[j]] = rmse - baseline
+        filled[j] += 1
+
+    return pd.DataFrame({
+        'feature': features,
+        'importance_mean': scores.mean(axis=1),
+        'importance_std': scores.std(axis=1),
+        'baseline_rmse': baseline,
+        'refit_rows': len(X_train),
+    }).sort_values('importance_mean', ascending=False).reset_index(drop=True)
+
+
+# ---------------------------------------------------------
+# Per-prediction explanations
+# ---------------------------------------------------------
+def _tree_tables(estimator):
+    # plain lists: scalar indexing is much cheaper than on numpy arrays
+    t = estimator.tree_
+    return (t.children_left.tolist(), t.children_right.tolist(), t.feature.tolist(),
+            t.threshold.tolist(), t.value.reshape(t.node_count, -1)[:, 0].tolist())
+
+
+class Explainer:
+    """
+    Per-prediction contributions for one loaded model.
+
+    For a scaled row x, base_value + sum(contributions) equals the model's
+    prediction (up to rounding). Supports XGBoost / LightGBM regressors and
+    sklearn random-forest / extra-trees / single-tree regressors; anything
+    else raises TypeError.
+    """
+
+    def __init__(self, model, features, version, cache_size=256):
+        self.model = model
+        self.features = list(features)
+        self.version = version
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._kind = self._detect_kind(model)
+        self.method = "saabas" if self._kind == "sklearn" else "treeshap"
+        self._trees = None
+        if self._kind == "sklearn":
+            estimators = getattr(model, "estimators_", None)
+            if estimators is None:
+                estimators = [model]
+            self._trees = [_tree_tables(e) for e in estimators]
+
+    @staticmethod
+    def _detect_kind(model):
+        module = type(model).__module__
+        if module.startswith("xgboost"):
+            return "xgboost"
+        if module.startswith("lightgbm"):
+            return "lightgbm"
+        # only forests average their trees; boosting / bagging need their own maths
+        from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor
+        from sklearn.tree import DecisionTreeRegressor, ExtraTreeRegressor
+        if isinstance(model, (RandomForestRegressor, ExtraTreesRegressor,
+                              DecisionTreeRegressor, ExtraTreeRegressor)):
+            return "sklearn"
+        raise TypeError(f"No tree explainer for model type {type(model).__name__}")
+
+    def contributions(self, x):
+        """Unrounded (base_value, per-feature contributions array) for one scaled row."""
+        x = np.asarray(x, dtype=np.float64).reshape(1, -1)
+        if self._kind == "xgboost":
+            import xgboost as xgb
+            out = self.model.get_booster().predict(xgb.DMatrix(x), pred_contribs=True)[0]
+            return float(out[-1]), out[:-1]
+        if self._kind == "lightgbm":
+            out = np.asarray(self.model.predict(x, pred_contrib=True))[0]
+            return float(out[-1]), out[:-1]
+
+        # sklearn trees compare float32 inputs against float64 thresholds
+        row = x[0].astype(np.float32).tolist()
+        contribs = np.zeros(len(self.features))
+        bias = 0.0
+        for left, right, feature, threshold, value in self._trees:
+            node = 0
+            bias += value[0]
+            while left[node] != -1:
+                f = feature[node]
+                child = left[node] if row[f] <= threshold[node] else right[node]
+                contribs[f] += value[child] - value[node]
+                node = child
+        n = len(self._trees)
+        return bias / n, contribs / n
+
+    def explain(self, x, key=None, top=None):
+        """
+        Explain one scaled feature row. `key` (usually the row's date) enables
+        caching under (version, key). `top` keeps the largest |contributions|.
+        """
+        cache_key = (self.version, key, top)
+        if key is not None:
+            with self._lock:
+                if cache_key in self._cache:
+                    self._cache.move_to_end(cache_key)
+                    return self._cache[cache_key]
+
+        bias, contribs = self.contributions(x)
+        order = np.argsort(-np.abs(contribs))
+        if top:
+            order = order[:top]
+        result = {
+            "method": self.method,
+            "base_value": round(float(bias), 2),
+            "contributions": [
+                {"feature": self.features[i], "contribution": round(float(contribs[i]), 2)}
+                for i in order
+            ],
+        }
+
+        if key is not None:
+            with self._lock:
+                self._cache[cache_key] = result
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Permutation importance for a saved model bundle.")
+    parser.add_argument("--bundle", default=DEFAULT_BUNDLE)
+    parser.add_argument("--data", default=DATA)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--block-size", type=int, default=7)
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes; <= 0 uses every core")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.bundle):
+        print("ERROR: bundle not found:", args.bundle)
+        sys.exit(1)
+    if not os.path.exists(args.data):
+        print("ERROR: features file not found. Run prepare_data.py first.")
+        sys.exit(1)
+
+    pi = permutation_importance(args.bundle, args.data, args.holdout,
+                                args.repeats, args.block_size, args.jobs)
+    stem = os.path.splitext(os.path.basename(args.bundle))[0]
+    out = args.out or os.path.join(BASE_DIR, f"permutation_importances_{stem}.csv")
+    pi.to_csv(out, index=False)
+    print(pi.to_string(index=False))
+    print("Saved permutation importances to:", out)
+
+
+if __name__ == "__main__":
+    main()
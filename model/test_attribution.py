@@ -0,0 +1,87 @@
+# model/test_attribution.py
+# Sanity checks for attribution.py on small models fit to features_enhanced.csv:
+#   - base_value + sum(contributions) == model.predict for RF, XGBoost, LightGBM
+#   - permutation_importance gives the same table with 1 and 2 worker processes,
+#     for a forest and for the OpenMP-backed boosters
+#   - bad bundles / holdouts fail with a clear ValueError
+import os, tempfile, joblib, numpy as np, pandas as pd
+from sklearn.preprocessing import StandardScaler
+from sklearn.ensemble import RandomForestRegressor
+import xgboost as xgb
+import lightgbm as lgb
+
+from attribution import Explainer, permutation_importance
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+DATA = os.path.join(BASE, "..", "data", "features_enhanced.csv")
+
+
+def load_xy():
+    df = pd.read_csv(DATA, parse_dates=['date']).sort_values('date').reset_index(drop=True)
+    df['target'] = df['close'].shift(-1)
+    df = df.dropna().reset_index(drop=True)
+    features = [c for c in df.columns if c not in ('date', 'target') and np.issubdtype(df[c].dtype, np.number)]
+    return features, df[features].values, df['target'].values
+
+
+def small_models():
+    return {
+        'RandomForest': RandomForestRegressor(n_estimators=20, random_state=0, n_jobs=1),
+        'XGBoost': xgb.XGBRegressor(n_estimators=30, max_depth=4, random_state=0, verbosity=0),
+        'LightGBM': lgb.LGBMRegressor(n_estimators=30, num_leaves=15, random_state=0, verbose=-1),
+    }
+
+
+def test_additivity():
+    features, X, y = load_xy()
+    Xs = StandardScaler().fit_transform(X)
+    rows = Xs[-25:]
+    for name, model in small_models().items():
+        model.fit(Xs, y)
+        explainer = Explainer(model, features, version="test")
+        preds = model.predict(rows)
+        for x, pred in zip(rows, preds):
+            bias, contribs = explainer.contributions(x)
+            assert np.isclose(bias + contribs.sum(), pred, rtol=1e-4, atol=1e-2), \
+                (name, bias + contribs.sum(), pred)
+        print(f"{name}: additivity OK on {len(rows)} rows")
+
+
+def test_parallel_matches_serial():
+    features, X, y = load_xy()
+    scaler = StandardScaler().fit(X)
+    for name, model in small_models().items():
+        model.fit(scaler.transform(X), y)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bundle.pkl")
+            joblib.dump({'model': model, 'scaler': scaler, 'features': features}, path)
+            serial = permutation_importance(path, DATA, n_repeats=3, n_jobs=1, seed=7)
+            parallel = permutation_importance(path, DATA, n_repeats=3, n_jobs=2, seed=7)
+        pd.testing.assert_frame_equal(serial, parallel)
+        print(f"{name}: permutation_importance n_jobs=1 and n_jobs=2 identical")
+
+
+def test_bad_inputs():
+    features, X, y = load_xy()
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y)
+    with tempfile.TemporaryDirectory() as tmp:
+        bare = os.path.join(tmp, "bare.pkl")
+        joblib.dump(model, bare)
+        bundle = os.path.join(tmp, "bundle.pkl")
+        joblib.dump({'model': model, 'scaler': None, 'features': features}, bundle)
+        tiny = os.path.join(tmp, "tiny.csv")
+        pd.read_csv(DATA).head(2).to_csv(tiny, index=False)
+        cases = [(bare, DATA, 0.2), (bundle, DATA, 0), (bundle, DATA, 1), (bundle, tiny, 0.2)]
+        for path, data, holdout in cases:
+            try:
+                permutation_importance(path, data, holdout=holdout, n_repeats=1, n_jobs=1)
+            except ValueError as e:
+                print("clear error:", e)
+            else:
+                raise AssertionError(f"expected ValueError for {path} holdout={holdout}")
+
+
+if __name__ == "__main__":
+    test_additivity()
+    test_parallel_matches_serial()
+    test_bad_inputs()